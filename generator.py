@@ -1,15 +1,17 @@
-from typing import Iterator, List
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterator, List, Optional, Tuple
 from cv2 import dnn_superres
-from requests import Session, post, get
+from requests.adapters import HTTPAdapter
+from requests import Session
 from ctypes import wintypes
 from io import BytesIO
 from PIL import Image
 import numpy as np
 import random
-import base64
 import sys
 import cv2
 import os
+import re
 
 """
 The wallpaper generator module.
@@ -33,6 +35,8 @@ Craiyon v2 (https://www.craiyon.com/)
 FSRCNN model (https://github.com/Saafke/FSRCNN_Tensorflow)
 """
 
+WALLPAPER_PATTERN = re.compile(r"wallpaper_(\d+)\.")
+
 
 class Generator:
     """
@@ -46,29 +50,67 @@ class Generator:
         URL of the image directory.
     headers : dict
         Headers for the API request.
+    session : Session
+        HTTP session shared by all requests.
     sr : DnnSuperResImpl
         Super resolution object.
+    sr_net : Net
+        Super resolution network for batched inference, loaded on first use.
+    sr_algo : str
+        Super resolution algorithm the model is set up for.
+    sr_scale : int
+        Scale the super resolution model is set up for.
+    sr_net_scale : int
+        Scale of the batched super resolution network.
+    trt_context : IExecutionContext
+        TensorRT execution context, None if no engine is available.
+    ov_model : CompiledModel
+        OpenVINO model for CPU inference, None if not available.
     version : str
         Version of the API.
+    system_params_info : Callable
+        SystemParametersInfoW, None on unsupported platforms.
 
     Methods
     -------
-    _setup_sr(model: str)
+    _setup_session()
+        Sets up the HTTP session.
+    _setup_wallpaper_api()
+        Sets up the Windows API function for changing the wallpaper.
+    _setup_sr(model: str, algo: str, scale: int)
         Sets up the super resolution object.
+    _set_dnn_backend(impl)
+        Sets the preferable DNN backend and target.
+    _setup_trt(model: str) -> bool
+        Sets up the TensorRT engine.
+    _setup_openvino(model: str, scale: int) -> bool
+        Sets up the OpenVINO model for CPU inference.
+    _upsample_luma(img: np.ndarray, infer: Callable) -> np.ndarray
+        Upsamples the image with a luma-only inference backend.
+    _infer_trt(luma: np.ndarray) -> np.ndarray
+        Runs the TensorRT engine on the luma plane.
+    _infer_ov(luma: np.ndarray) -> np.ndarray
+        Runs the OpenVINO model on the luma plane.
+    _merge_luma(ycrcb: np.ndarray, luma: np.ndarray) -> np.ndarray
+        Merges the upsampled luma channel with the upscaled chroma channels.
     _request(prompt: str) -> dict
         Gets the images from the API.
     _clean_dir(path: str) -> int
         Cleans the directory of old images.
     _save_for_wallpaper(image: Image) -> str
         Saves the image for the wallpaper.
-    generate(text: str) -> List[Image.Image]
+    generate(text: str) -> List[bytes]
         Generates images from a prompt.
-    decode(images: List[Image.Image]) -> Iterator[Image.Image]
-        Decodes the images from base64.
+    decode(images: List[bytes], size: Tuple[int, int]) -> Iterator[Image.Image]
+        Decodes the images.
     upscale(image: Image, scale: int) -> Image
         Upscales the image.
+    upscale_batch(images: List[Image.Image], scale: int) -> List[Image.Image]
+        Upscales all images in a single forward pass.
     set_as_wallpaper(image: Image)
         Sets the image as the wallpaper.
+    close()
+        Closes the HTTP session.
     resize_to_6_to_4(image: Image) -> Image
         Resizes the image to 6:4.
     """
@@ -87,22 +129,338 @@ class Generator:
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/110.0.0.0 Safari/537.36",
         }
         self.version = "35s5hfwn9n78gb06"
+        self._setup_session()
         self._setup_sr("FSRCNN-small_x4")
+        self._setup_wallpaper_api()
         sys.stdout.write("Generator initialized.\n")
 
-    def _setup_sr(self, model: str) -> None:
+    def __enter__(self) -> "Generator":
+        """
+        Enters the context of the generator.
+        """
+
+        return self
+
+    def __exit__(self, *args) -> None:
+        """
+        Exits the context of the generator and closes the HTTP session.
+        """
+
+        self.close()
+
+    def close(self) -> None:
+        """
+        Closes the HTTP session.
+        """
+
+        self.session.close()
+
+    def _setup_session(self) -> None:
+        """
+        Sets up the HTTP session.
+        The session keeps connections to the API and the image host alive
+        across requests.
+        """
+
+        self.session = Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=20)
+        self.session.mount(self.api_url, adapter)
+        self.session.mount(self.img_url, adapter)
+        self.session.headers.update(self.headers)
+
+    def _setup_wallpaper_api(self) -> None:
+        """
+        Sets up the Windows API function for changing the wallpaper.
+        The function stays None on unsupported platforms.
+        """
+
+        self.system_params_info = None
+        if sys.platform in ["win32", "cygwin"]:
+            import ctypes
+
+            try:
+                system_params_info = ctypes.windll.user32.SystemParametersInfoW
+            except AttributeError:
+                return
+            system_params_info.argtypes = (
+                ctypes.c_uint,
+                ctypes.c_uint,
+                ctypes.c_void_p,
+                ctypes.c_uint,
+            )
+            system_params_info.restype = wintypes.BOOL
+            self.system_params_info = system_params_info
+
+    def _setup_sr(self, model: str, algo: str = "fsrcnn", scale: int = 4) -> None:
         """
         Sets up the super resolution object.
+        Uses the CUDA backend if OpenCV was built with CUDA support and a
+        device is available, otherwise falls back to the CPU.
 
         Parameters
         ----------
         model : str
             The model to use.
+        algo : str
+            The algorithm of the model.
+        scale : int
+            The scale of the model.
         """
 
         self.sr = dnn_superres.DnnSuperResImpl_create()
         path = os.path.join(os.path.dirname(__file__), "models", f"{model}.pb")
         self.sr.readModel(path)
+        self.sr.setModel(algo, scale)
+        self.sr_algo = algo
+        self.sr_scale = scale
+        self.sr_path = path
+        self.sr_net = None
+        self.sr_net_scale = scale
+        try:
+            self.sr_use_cuda = cv2.cuda.getCudaEnabledDeviceCount() > 0
+        except cv2.error:
+            self.sr_use_cuda = False
+        self._set_dnn_backend(self.sr)
+        self._setup_trt(model)
+        self.ov_model = None
+        if not self.sr_use_cuda:
+            self._setup_openvino(model, scale)
+
+    def _set_dnn_backend(self, impl) -> None:
+        """
+        Sets the preferable DNN backend and target.
+
+        Parameters
+        ----------
+        impl : DnnSuperResImpl | Net
+            The object to configure.
+        """
+
+        if self.sr_use_cuda:
+            impl.setPreferableBackend(cv2.dnn.DNN_BACKEND_CUDA)
+            impl.setPreferableTarget(cv2.dnn.DNN_TARGET_CUDA_FP16)
+        else:
+            impl.setPreferableBackend(cv2.dnn.DNN_BACKEND_OPENCV)
+            impl.setPreferableTarget(cv2.dnn.DNN_TARGET_CPU)
+
+    def _setup_trt(self, model: str) -> bool:
+        """
+        Sets up the TensorRT engine.
+        The engine is loaded from a serialized plan next to the model, e.g.
+        built with `trtexec --onnx=model.onnx --fp16 --saveEngine=model.plan`.
+        The engine needs static input and output shapes, either in NCHW or
+        NHWC layout, and TensorRT 8.5 or newer. Otherwise dnn_superres is used.
+
+        Parameters
+        ----------
+        model : str
+            The model to use.
+
+        Returns
+        -------
+        bool
+            Whether the engine could be loaded.
+        """
+
+        self.trt_context = None
+        path = os.path.join(os.path.dirname(__file__), "models", f"{model}.plan")
+        if not os.path.isfile(path):
+            return False
+        try:
+            import tensorrt as trt
+            import pycuda.driver as cuda
+        except ImportError:
+            return False
+        try:
+            import pycuda.autoinit  # noqa: F401
+        except (cuda.Error, RuntimeError):
+            return False
+
+        runtime = trt.Runtime(trt.Logger(trt.Logger.WARNING))
+        with open(path, "rb") as f:
+            engine = runtime.deserialize_cuda_engine(f.read())
+        if engine is None:
+            return False
+        try:
+            names = [engine.get_tensor_name(i) for i in range(engine.num_io_tensors)]
+            in_names = [
+                name
+                for name in names
+                if engine.get_tensor_mode(name) == trt.TensorIOMode.INPUT
+            ]
+            out_names = [name for name in names if name not in in_names]
+        except AttributeError:
+            return False
+        if len(in_names) != 1 or len(out_names) != 1:
+            return False
+        in_shape = tuple(engine.get_tensor_shape(in_names[0]))
+        out_shape = tuple(engine.get_tensor_shape(out_names[0]))
+        if len(in_shape) != 4 or len(out_shape) != 4 or min(in_shape + out_shape) < 1:
+            return False
+        nhwc = in_shape[3] == 1
+        self.trt_in_size = in_shape[1:3] if nhwc else in_shape[2:]
+        self.trt_out_size = out_shape[1:3] if nhwc else out_shape[2:]
+
+        try:
+            self.trt_stream = cuda.Stream()
+            self.trt_host_in = cuda.pagelocked_empty(in_shape, np.float32)
+            self.trt_host_out = cuda.pagelocked_empty(out_shape, np.float32)
+            self.trt_dev_in = cuda.mem_alloc(self.trt_host_in.nbytes)
+            self.trt_dev_out = cuda.mem_alloc(self.trt_host_out.nbytes)
+            context = engine.create_execution_context()
+        except cuda.Error:
+            return False
+        if context is None:
+            return False
+        context.set_tensor_address(in_names[0], int(self.trt_dev_in))
+        context.set_tensor_address(out_names[0], int(self.trt_dev_out))
+        self.trt_engine = engine
+        self.trt_context = context
+        return True
+
+    def _setup_openvino(self, model: str, scale: int) -> bool:
+        """
+        Sets up the OpenVINO model for CPU inference.
+        The model is loaded from an IR next to the model, e.g. converted with
+        `mo --input_model model.pb` and INT8-quantized with the Post-Training
+        Optimization Tool.
+        If the IR has a static input size, other image sizes use dnn_superres.
+
+        Parameters
+        ----------
+        model : str
+            The model to use.
+        scale : int
+            The scale of the model.
+
+        Returns
+        -------
+        bool
+            Whether the model could be loaded.
+        """
+
+        path = os.path.join(os.path.dirname(__file__), "models", f"{model}.xml")
+        if not os.path.isfile(path):
+            return False
+        try:
+            from openvino import Core
+        except ImportError:
+            return False
+
+        try:
+            compiled_model = Core().compile_model(path, "CPU")
+            input_shape = compiled_model.input(0).partial_shape
+        except RuntimeError:
+            return False
+        if input_shape.rank.is_dynamic or input_shape.rank.get_length() != 4:
+            return False
+        self.ov_nhwc = input_shape[3].is_static and input_shape[3].get_length() == 1
+        spatial = [input_shape[i] for i in ((1, 2) if self.ov_nhwc else (2, 3))]
+        if all(dim.is_static for dim in spatial):
+            self.ov_in_size = tuple(dim.get_length() for dim in spatial)
+        else:
+            self.ov_in_size = None
+        self.ov_scale = scale
+        self.ov_model = compiled_model
+        return True
+
+    def _upsample_luma(
+        self, img: np.ndarray, infer: Callable[[np.ndarray], np.ndarray]
+    ) -> np.ndarray:
+        """
+        Upsamples the image with a luma-only inference backend.
+        Like dnn_superres for FSRCNN, only the luma channel goes through the
+        network, the chroma channels are upscaled bicubically.
+
+        Parameters
+        ----------
+        img : np.ndarray
+            The BGR image to upsample.
+        infer : Callable[[np.ndarray], np.ndarray]
+            The inference call mapping the normalized luma plane to the
+            upsampled one.
+
+        Returns
+        -------
+        np.ndarray
+            The upsampled BGR image.
+        """
+
+        ycrcb = cv2.cvtColor(img, cv2.COLOR_BGR2YCrCb)
+        luma = ycrcb[:, :, 0].astype(np.float32) / 255.0
+        up = self._merge_luma(ycrcb, infer(luma))
+        return cv2.cvtColor(up, cv2.COLOR_YCrCb2BGR)
+
+    def _infer_ov(self, luma: np.ndarray) -> np.ndarray:
+        """
+        Runs the OpenVINO model on the luma plane.
+
+        Parameters
+        ----------
+        luma : np.ndarray
+            The normalized luma plane.
+
+        Returns
+        -------
+        np.ndarray
+            The upsampled luma plane.
+        """
+
+        height, width = luma.shape
+        if self.ov_nhwc:
+            blob = luma.reshape(1, height, width, 1)
+        else:
+            blob = luma.reshape(1, 1, height, width)
+        out = self.ov_model([blob])[self.ov_model.output(0)]
+        return np.squeeze(out)
+
+    def _infer_trt(self, luma: np.ndarray) -> np.ndarray:
+        """
+        Runs the TensorRT engine on the luma plane.
+
+        Parameters
+        ----------
+        luma : np.ndarray
+            The normalized luma plane.
+
+        Returns
+        -------
+        np.ndarray
+            The upsampled luma plane.
+        """
+
+        import pycuda.driver as cuda
+
+        self.trt_host_in.reshape(self.trt_in_size)[...] = luma
+        cuda.memcpy_htod_async(self.trt_dev_in, self.trt_host_in, self.trt_stream)
+        self.trt_context.execute_async_v3(self.trt_stream.handle)
+        cuda.memcpy_dtoh_async(self.trt_host_out, self.trt_dev_out, self.trt_stream)
+        self.trt_stream.synchronize()
+        return self.trt_host_out.reshape(self.trt_out_size)
+
+    def _merge_luma(self, ycrcb: np.ndarray, luma: np.ndarray) -> np.ndarray:
+        """
+        Merges the upsampled luma channel with the bicubically upscaled
+        chroma channels of the original image.
+
+        Parameters
+        ----------
+        ycrcb : np.ndarray
+            The original YCrCb image.
+        luma : np.ndarray
+            The upsampled luma channel, normalized to [0, 1].
+
+        Returns
+        -------
+        np.ndarray
+            The upsampled YCrCb image.
+        """
+
+        up = cv2.resize(
+            ycrcb, (luma.shape[1], luma.shape[0]), interpolation=cv2.INTER_CUBIC
+        )
+        up[:, :, 0] = np.clip(np.rint(luma * 255.0), 0, 255)
+        return up
 
     def _request(self, prompt: str) -> List[bytes]:
         """
@@ -124,32 +482,30 @@ class Generator:
             If the response status code is not 200.
         """
 
-        session = Session()
         data = {"prompt": prompt, "token": None, "version": self.version}
-        response = session.post(
-            self.api_url,
-            headers={
-                **self.headers,
-                "Content-Type": "application/json",
-                "Accept": "application/json",
-            },
-            json=data,
+        response = self.session.post(
+            self.api_url, headers={"Accept": "application/json"}, json=data
         )
         if response.status_code == 200:
-            images = []
-            for path in response.json()["images"]:
-                img_resp = session.get(
-                    self.img_url + "/" + path, headers={**self.headers, "Accept": "*/*"}
+            urls = [self.img_url + "/" + path for path in response.json()["images"]]
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                img_responses = list(
+                    executor.map(
+                        lambda url: self.session.get(url, headers={"Accept": "*/*"}),
+                        urls,
+                    )
                 )
+            images = []
+            for img_resp in img_responses:
                 if img_resp.status_code == 200:
-                    images.append(base64.b64encode(img_resp.content))
+                    images.append(img_resp.content)
                 else:
                     raise Exception(img_resp.text)
             return images
         else:
             raise Exception(response.text)
 
-    def generate(self, text: str) -> List[Image.Image]:
+    def generate(self, text: str) -> List[bytes]:
         """
         Generates images from a prompt.
 
@@ -160,20 +516,25 @@ class Generator:
 
         Returns
         -------
-        List[Image.Image]
+        List[bytes]
             The generated images.
         """
 
         return self._request(text)
 
-    def decode(self, images: List[bytes]) -> Iterator[Image.Image]:
+    def decode(
+        self, images: List[bytes], size: Optional[Tuple[int, int]] = None
+    ) -> Iterator[Image.Image]:
         """
-        Decodes the images from base64.
+        Decodes the images.
 
         Parameters
         ----------
         images : List[bytes]
             The images to decode.
+        size : Optional[Tuple[int, int]]
+            The requested size for previews. JPEG images are then decoded
+            at a reduced scale close to it, the full size is kept otherwise.
 
         Yields
         -------
@@ -181,7 +542,11 @@ class Generator:
             The decoded images.
         """
 
-        yield from (Image.open(BytesIO(base64.decodebytes(img))) for img in images)
+        for img in images:
+            image = Image.open(BytesIO(img))
+            if size is not None:
+                image.draft("RGB", size)
+            yield image
 
     def upscale(self, image: Image, scale: int) -> Image:
         """
@@ -200,10 +565,78 @@ class Generator:
             The upscaled image.
         """
 
-        img = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
-        self.sr.setModel("fsrcnn", scale)
-        up = self.sr.upsample(img, scale)
-        return Image.fromarray(cv2.cvtColor(up, cv2.COLOR_BGR2RGB))
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+        img = np.ascontiguousarray(np.asarray(image)[:, :, ::-1])
+        if (
+            self.trt_context is not None
+            and img.shape[:2] == self.trt_in_size
+            and self.trt_out_size[0] == img.shape[0] * scale
+        ):
+            up = self._upsample_luma(img, self._infer_trt)
+        elif (
+            self.ov_model is not None
+            and scale == self.ov_scale
+            and self.ov_in_size in (None, img.shape[:2])
+        ):
+            up = self._upsample_luma(img, self._infer_ov)
+        else:
+            if scale != self.sr_scale:
+                self.sr.setModel(self.sr_algo, scale)
+                self.sr_scale = scale
+            up = self.sr.upsample(img)
+        cv2.cvtColor(up, cv2.COLOR_BGR2RGB, dst=up)
+        return Image.fromarray(up)
+
+    def upscale_batch(self, images: List[Image.Image], scale: int) -> List[Image.Image]:
+        """
+        Upscales all images in a single forward pass.
+        The images must all have the same size.
+
+        Parameters
+        ----------
+        images : List[Image.Image]
+            The images to upscale.
+        scale : int
+            The scale to use.
+
+        Returns
+        -------
+        List[Image.Image]
+            The upscaled images.
+
+        Raises
+        ------
+        Exception
+            If no images are given or the scale does not match the model.
+        """
+
+        if not images:
+            raise Exception("No images to upscale.")
+        if scale != self.sr_net_scale:
+            raise Exception("Scale does not match the model.")
+        if self.sr_net is None:
+            self.sr_net = cv2.dnn.readNetFromTensorflow(self.sr_path)
+            self._set_dnn_backend(self.sr_net)
+
+        ycrcbs = [
+            cv2.cvtColor(
+                np.asarray(image if image.mode == "RGB" else image.convert("RGB")),
+                cv2.COLOR_RGB2YCrCb,
+            )
+            for image in images
+        ]
+        blob = cv2.dnn.blobFromImages(
+            [ycrcb[:, :, 0] for ycrcb in ycrcbs], scalefactor=1.0 / 255.0
+        )
+        self.sr_net.setInput(blob)
+        out = self.sr_net.forward()
+        return [
+            Image.fromarray(
+                cv2.cvtColor(self._merge_luma(ycrcb, luma[0]), cv2.COLOR_YCrCb2RGB)
+            )
+            for ycrcb, luma in zip(ycrcbs, out)
+        ]
 
     def _clean_dir(self, path: str) -> int:
         """
@@ -220,17 +653,16 @@ class Generator:
             The index of the next image.
         """
 
-        files = [f for f in os.listdir(path) if os.path.isfile(os.path.join(path, f))]
-        max_number = 0
-        for f in files:
-            max_number = (
-                int(f.split(".")[0].split("_")[1])
-                if int(f.split(".")[0].split("_")[1]) > max_number
-                else max_number
-            )
-        for f in files:
-            if int(f.split(".")[0].split("_")[1]) < max_number:
-                os.remove(os.path.join(path, f))
+        with os.scandir(path) as it:
+            files = [
+                (int(match.group(1)), entry.path)
+                for entry in it
+                if entry.is_file() and (match := WALLPAPER_PATTERN.match(entry.name))
+            ]
+        max_number = max((number for number, _ in files), default=0)
+        for number, file_path in files:
+            if number < max_number:
+                os.remove(file_path)
         return max_number + 1
 
     def _save_for_wallpaper(self, image: Image) -> str:
@@ -259,21 +691,15 @@ class Generator:
             home_dir = os.environ["USERPROFILE"] or os.environ["HOME"]
         if home_dir is None:
             raise Exception("Could not find home directory.")
-        if not os.path.exists(os.path.join(os.path.normpath(home_dir), "Pictures")):
-            os.mkdir(os.path.join(os.path.normpath(home_dir), "Pictures"))
         dir_path = os.path.join(
             os.path.normpath(home_dir), "Pictures", "wallpaper-generator"
         )
-        if not os.path.exists(dir_path):
-            os.mkdir(dir_path)
+        os.makedirs(dir_path, exist_ok=True)
         idx = self._clean_dir(dir_path)
-        path = os.path.join(
-            os.path.normpath(home_dir),
-            "Pictures",
-            "wallpaper-generator",
-            f"wallpaper_{idx}.jpg",
+        path = os.path.join(dir_path, f"wallpaper_{idx}.jpg")
+        image.save(
+            path, "JPEG", quality=92, subsampling=0, progressive=False, optimize=False
         )
-        image.save(path)
         return path
 
     def set_as_wallpaper(self, image: Image) -> None:
@@ -291,37 +717,20 @@ class Generator:
             If the platform is not supported.
         """
 
-        if sys.platform in ["win32", "cygwin"]:
-            import ctypes
-
-            SPI_SET_DESK_WALLPAPER = 0x14
-            SPIF_UPDATE_INI_FILE = 0x1
-            SPIF_SEND_WIN_INI_CHANGE = 0x2
+        if self.system_params_info is None:
+            raise Exception("Unsupported platform.")
 
-            system_params_info = ctypes.windll.user32.SystemParametersInfoW
-            system_params_info.argtypes = (
-                ctypes.c_uint,
-                ctypes.c_uint,
-                ctypes.c_void_p,
-                ctypes.c_uint,
-            )
-            system_params_info.restype = wintypes.BOOL
+        SPI_SET_DESK_WALLPAPER = 0x14
+        SPIF_UPDATE_INI_FILE = 0x1
+        SPIF_SEND_WIN_INI_CHANGE = 0x2
 
-            system_params_info(
-                SPI_SET_DESK_WALLPAPER,
-                0,
-                "",
-                SPIF_UPDATE_INI_FILE | SPIF_SEND_WIN_INI_CHANGE,
-            )
-            img_path = self._save_for_wallpaper(image)
-            system_params_info(
-                SPI_SET_DESK_WALLPAPER,
-                0,
-                img_path,
-                SPIF_UPDATE_INI_FILE | SPIF_SEND_WIN_INI_CHANGE,
-            )
-        else:
-            raise Exception("Unsupported platform.")
+        img_path = self._save_for_wallpaper(image)
+        self.system_params_info(
+            SPI_SET_DESK_WALLPAPER,
+            0,
+            img_path,
+            SPIF_UPDATE_INI_FILE | SPIF_SEND_WIN_INI_CHANGE,
+        )
 
     def resize_to_6_to_4(self, image: Image) -> Image:
         """
@@ -346,19 +755,21 @@ class Generator:
         else:
             image_to_work_with = image
 
-        width, height = image_to_work_with.size
+        if image_to_work_with.mode != "RGB":
+            image_to_work_with = image_to_work_with.convert("RGB")
+        img = np.asarray(image_to_work_with)
+        height, width = img.shape[:2]
         quarter_width = width // 4
-        wip_image = Image.new("RGB", (width + width // 2, height))
-        wip_image.paste(image_to_work_with, (quarter_width, 0))
+        wip_img = np.empty((height, width + width // 2, 3), dtype=np.uint8)
+        wip_img[:, quarter_width : quarter_width + width] = img
 
-        left_img = image_to_work_with.crop((0, 0, quarter_width, height))
-        right_img = image_to_work_with.crop((width - quarter_width, 0, width, height))
-        left_img = left_img.transpose(Image.FLIP_LEFT_RIGHT)
-        right_img = right_img.transpose(Image.FLIP_LEFT_RIGHT)
-        wip_image.paste(left_img, (0, 0))
-        wip_image.paste(right_img, (width + quarter_width, 0))
+        wip_img[:, :quarter_width] = img[:, :quarter_width][:, ::-1]
+        wip_img[:, width + quarter_width : width + 2 * quarter_width] = img[
+            :, width - quarter_width :
+        ][:, ::-1]
+        wip_img[:, width + 2 * quarter_width :] = 0
 
-        return wip_image
+        return Image.fromarray(wip_img)
 
 
 if __name__ == "__main__":
@@ -371,16 +782,16 @@ if __name__ == "__main__":
         "cyberpunk, wired, vibrant high contrast, hyperrealistic, photographic, 8k, 85mm, f2.8, octane render, person, spotlight, cyberpunk city, cyberpunk man",
         "hacker, dark, atmospheric, digital art, detailed, high definition, 8k, green bytes floating, zero and ones, hoodie, black",
     ]
-    generator = Generator()
-    prompt = random.choice(prompts)
-    sys.stdout.write(f"Generating image for prompt: {prompt}\n")
-    images = generator.generate(prompt)
-    sys.stdout.write("Decoding images...\n")
-    images = generator.decode(images)
-    sys.stdout.write("Upscaling image...\n")
-    image = generator.upscale(random.choice([*images]), 4)
-    sys.stdout.write("Resizing image...\n")
-    image = generator.resize_to_6_to_4(image)
-    sys.stdout.write("Setting wallpaper...\n")
-    generator.set_as_wallpaper(image)
-    sys.stdout.write("Done.\n")
+    with Generator() as generator:
+        prompt = random.choice(prompts)
+        sys.stdout.write(f"Generating image for prompt: {prompt}\n")
+        images = generator.generate(prompt)
+        sys.stdout.write("Decoding image...\n")
+        image = next(generator.decode([random.choice(images)]))
+        sys.stdout.write("Upscaling image...\n")
+        image = generator.upscale(image, 4)
+        sys.stdout.write("Resizing image...\n")
+        image = generator.resize_to_6_to_4(image)
+        sys.stdout.write("Setting wallpaper...\n")
+        generator.set_as_wallpaper(image)
+        sys.stdout.write("Done.\n")